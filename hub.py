@@ -2,15 +2,19 @@ import datetime
 import re
 from item import Item
 import json
+import bisect
+from stats import Rollup, Fenwick, SegmentTree
 
 
 class Hub:
     _items = []
     _hub = None
+    _storage = None
 
     def __new__(cls, *args, **kwargs):
         if cls._hub is None:
             cls._hub = object.__new__(cls)
+            cls._hub._reset_stats()
 
         return cls._hub
 
@@ -18,30 +22,85 @@ class Hub:
         self._date = date
 
     def __getitem__(self, item):
+        if self._storage is not None:
+            if isinstance(item, slice):
+                return self.get_items()[item]
+            return self._storage.at(item)
         return self._items[item]
 
+    def __iter__(self):
+        if self._storage is not None:
+            return iter(self._storage)
+        return iter(self._items)
+
     def __repr__(self):
-        return ', '.join([i.get_name() for i in self._items])
+        return ', '.join([i.get_name() for i in self])
 
     def __str__(self):
-        return f'Хаб содержит {len(self._items)} позиции: {", ".join(sorted([i.get_name() for i in self._items]))}'
+        return f'Хаб содержит {len(self)} позиции: {", ".join(sorted([i.get_name() for i in self]))}'
 
     def __len__(self):
+        if self._storage is not None:
+            return len(self._storage)
         return len(self._items)
 
+    @property
+    def storage(self):
+        """Returns storage where Hub keeps Items. None means that Items are kept in memory"""
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage):
+        """Sets storage for Hub. Items of current storage are copied to new one in batches.
+        Previous storage is closed and its file is left as is. None sets Hub to keep Items in memory"""
+        if storage is self._storage:
+            return
+
+        previous, items = self._storage, self._items
+        self._storage = storage
+        self._items = []
+        self._reset_stats()
+        if storage is not None:
+            storage._hub = self
+
+        for item in items if previous is None else previous:
+            self.add_item(item)
+
+        if previous is not None:
+            previous.close()
+            previous._hub = None
+
+    def flush(self):
+        """Writes added Items in storage. Does nothing if Items are kept in memory"""
+        if self._storage is not None:
+            self._storage.flush()
+
     def add_item(self, item):
         """Adds Item in Hub"""
         if isinstance(item, Item) or issubclass(type(item), Item):
-            self._items.append(item)
+            if self._storage is not None:
+                if not self._storage.add(item):
+                    return
+            else:
+                self._items.append(item)
+                self._refs[item.get_id()] = self._refs.get(item.get_id(), 0) + 1
+                self._add_stats(item)
+            item._hub = self
         else:
             raise AttributeError('Item must be class Item or its subclass')
 
     def get_items(self):
         """Returns list of existed Items in Hub """
+        if self._storage is not None:
+            return list(self._storage)
         return self._items
 
     def find_by_id(self, item_id):
         """Returns list of Item indexes and names"""
+        if self._storage is not None:
+            item = self._storage.get(item_id)
+            return [-1, None] if item is None else [self._storage.index(item_id), item.get_name()]
+
         for index, item in enumerate(self._items):
             if item.get_id() == item_id:
                 return [index, item.get_name()]
@@ -49,6 +108,9 @@ class Hub:
 
     def find_by_tags(self, tags):
         """Returns list of Items which contains all tags in getting argument"""
+        if self._storage is not None:
+            return self._storage.find_by_tags(tags)
+
         items = []
         for item in self._items:
             if len(item.get_tags()) > len(tags):
@@ -64,20 +126,164 @@ class Hub:
 
     def rm_item(self, i):
         """Removes Item from Hub"""
+        if self._storage is not None:
+            self._storage.remove([i.get_id() if isinstance(i, Item) else i])
+            if isinstance(i, Item):
+                i._hub = None
+            return
+
         for item in enumerate(self._items):
             if item[1].get_id() == i or item[1] is i:
                 del self._items[item[0]]
+                self._rm_stats(item[1])
+                self._refs[item[1].get_id()] -= 1
+                if not self._refs[item[1].get_id()]:
+                    del self._refs[item[1].get_id()]
+                    item[1]._hub = None
                 break
 
     def drop_items(self, items):
         """Removes all Items which includes in argument"""
+        if self._storage is not None:
+            items = [item for item in items if isinstance(item, Item)]
+            self._storage.remove([item.get_id() for item in items])
+            for item in items:
+                item._hub = None
+            return
+
         for item in items:
             if item in self._items:
                 self._hub.rm_item(item)
 
     def clear(self):
         """Drops all Items from Hub"""
+        for item in self._items:
+            item._hub = None
         self._items = []
+        if self._storage is not None:
+            self._storage.clear()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Drops all aggregates of Hub. They are kept only for Items in memory, storage counts its own"""
+        self._refs = {}  # Сколько раз каждый Item добавлен в Hub (по id)
+        self._total_stats = Rollup()
+        self._tag_stats = {}
+        self._date_stats = {}
+        self._dates = []  # Отсортированный список дат, для которых есть Items
+        self._date_tree = Fenwick()
+        self._date_extremes = SegmentTree()
+
+    def _add_stats(self, item):
+        """Adds Item's cost in aggregates"""
+        self._total_stats.add(item.cost)
+        for tag in set(item.get_tags()):
+            self._tag_stats.setdefault(tag, Rollup()).add(item.cost)
+
+        date = item.get_date()
+        if date not in self._date_stats:
+            self._date_stats[date] = Rollup()
+            bisect.insort(self._dates, date)
+        self._date_stats[date].add(item.cost)
+        self._date_tree.update(date, 1, item.cost)
+        self._date_extremes.update(date, self._date_stats[date].min(), self._date_stats[date].max())
+
+    def _rm_stats(self, item, cost=None):
+        """Removes Item's cost from aggregates. Cost may be set if Item's cost has been already changed"""
+        cost = item.cost if cost is None else cost
+        self._total_stats.remove(cost)
+        for tag in set(item.get_tags()):
+            self._rm_tag_stats(tag, cost)
+
+        date = item.get_date()
+        self._date_stats[date].remove(cost)
+        self._date_extremes.update(date, self._date_stats[date].min(), self._date_stats[date].max())
+        if not self._date_stats[date]:
+            del self._date_stats[date]
+            del self._dates[bisect.bisect_left(self._dates, date)]
+        self._date_tree.update(date, -1, -cost)
+
+    def _rm_tag_stats(self, tag, cost):
+        """Removes cost from tag's aggregate"""
+        self._tag_stats[tag].remove(cost)
+        if not self._tag_stats[tag]:
+            del self._tag_stats[tag]
+
+    def _update_cost(self, item, old_cost):
+        """Moves Item in aggregates from old cost to current one. Called by Item"""
+        if self._storage is not None:
+            if not self._storage.update_cost(item):
+                item._hub = None
+            return
+
+        for _ in range(self._refs.get(item.get_id(), 0)):
+            self._rm_stats(item, old_cost)
+            self._add_stats(item)
+
+    def _update_tags(self, item, added, removed):
+        """Updates tags' aggregates after Item's tags have been changed. Called by Item"""
+        if self._storage is not None:
+            if not self._storage.update_tags(item, added, removed):
+                item._hub = None
+            return
+
+        for _ in range(self._refs.get(item.get_id(), 0)):
+            for tag in added:
+                self._tag_stats.setdefault(tag, Rollup()).add(item.cost)
+            for tag in removed:
+                self._rm_tag_stats(tag, item.cost)
+
+    def stats(self, *dates, tag=None):
+        """Returns dict with count, sum, min and max of Items' costs.
+        Without arguments statistics is calculated for all Items in Hub, with tag - for Items with this tag.
+        Dates work the same way as in find_by_date: one date - Items where dispatch time is less than argument,
+        two dates - Items where dispatch time is between first and second arguments.
+        With storage attached statistics is kept in storage's rollups, see SQLiteStorage.stats"""
+        if tag is not None:
+            if dates:
+                raise AttributeError('Method gets either dates or tag')
+            if self._storage is not None:
+                return self._storage.stats(tag=tag)
+            return self._tag_stats.get(tag, Rollup()).as_dict()
+
+        if not dates:
+            if self._storage is not None:
+                return self._storage.stats()
+            return self._total_stats.as_dict()
+        if len(dates) not in (1, 2):
+            raise AttributeError('Method gets 1 or 2 arguments: max date or min and max dates')
+
+        datetimes = []
+        for i in dates:
+            if re.fullmatch('[0-9]{2}.[0-9]{2}.[0-9]{4}', i):
+                day, month, year = map(int, i.split('.'))
+                datetimes.append(datetime.date(year, month, day))
+            else:
+                raise AttributeError('Date must be in format "DD.MM.YYYY"')
+
+        if len(datetimes) == 1:
+            min_date, max_date = datetime.date.min, datetimes[0]
+        else:
+            min_date, max_date = min(datetimes), max(datetimes)
+
+        if self._storage is not None:
+            return self._storage.stats(min_date, max_date)
+
+        count, total = self._date_tree.range(min_date, max_date)
+        low, high = self._date_extremes.range(min_date, max_date)
+        return {'count': count, 'sum': total, 'min': low, 'max': high}
+
+    def tag_stats(self):
+        """Returns dict where keys are tags and values are statistics of Items with this tag"""
+        if self._storage is not None:
+            return self._storage.tag_stats()
+        return {tag: rollup.as_dict() for tag, rollup in self._tag_stats.items()}
+
+    def date_stats(self):
+        """Returns dict where keys are dispatch dates and values are statistics of Items with this date"""
+        if self._storage is not None:
+            return self._storage.date_stats()
+        return {date: self._date_stats[date].as_dict() for date in self._dates}
 
     @property
     def date(self):
@@ -109,6 +315,11 @@ class Hub:
             else:
                 raise AttributeError('Date must be in format "DD.MM.YYYY"')
 
+        if self._storage is not None:
+            if len(datetimes) == 1:
+                return self._storage.find_by_date(datetime.date.min, datetimes[0])
+            return self._storage.find_by_date(min(datetimes), max(datetimes))
+
         if len(datetimes) == 1:
             for item in self._items:
                 if item.get_date() <= datetimes[0]:
@@ -124,9 +335,12 @@ class Hub:
         """Returns the most valuable items in Hub.
         If there are more items satisfying the condition then all of them will be returned.
         For example, amount = 1; there are 3 items in Hub with the highest price (5000). 3 items will be returned"""
-        if len(self._items) == 0:
+        if len(self) == 0:
             raise ValueError("Hub doesn't contain any Items")
 
+        if self._storage is not None:
+            return self._storage.find_most_valuable(amount)
+
         if len(self._items) <= amount:
             return sorted(self._items, key=lambda x: x.cost)
 
@@ -9,6 +9,8 @@ class Item:
 
     def __init__(self, name, description, dispatch_time, cost=0, *tags):
         self._tags = []
+        self._hub = None  # Hub, в котором лежит Item; получает уведомления об изменениях
+        self._stored_in = None  # uid файла SQLiteStorage, из которого Item прочитан или в который добавлен
         self._id = next(self._ids)
         self._name = name
         self._description = description
@@ -48,23 +50,36 @@ class Item:
         if tag in self._tags:
             return 'Tag already exists'
         self._tags.append(tag)
+        if self._hub is not None:
+            self._hub._update_tags(self, [tag], [])
 
     def add_tags(self, tags):
         """Adds few tags in Item"""
+        added = []
         for tag in tags:
             if tag in self._tags:
                 continue
             self._tags.append(tag)
+            added.append(tag)
+        if self._hub is not None:
+            self._hub._update_tags(self, added, [])
 
     def rm_tag(self, tag):
         """Removes one tag from Item"""
         self._tags.remove(tag)
+        if self._hub is not None and tag not in self._tags:
+            self._hub._update_tags(self, [], [tag])
 
     def rm_tags(self, tags):
         """Removes few tags from Item"""
+        removed = []
         for tag in tags:
             if tag in self._tags:
                 self._tags.remove(tag)
+                if tag not in self._tags:
+                    removed.append(tag)
+        if self._hub is not None:
+            self._hub._update_tags(self, [], removed)
 
     def get_id(self):
         """Returns Item's id"""
@@ -104,7 +119,9 @@ class Item:
         """Sets Item's cost"""
         if value <= 0:
             raise ValueError("Cost must be more than 0")
-        self._cost = value
+        old_cost, self._cost = self._cost, value
+        if self._hub is not None:
+            self._hub._update_cost(self, old_cost)
 
     def copy(self):
         """Returns copy of object with new id"""
@@ -130,6 +147,20 @@ class Item:
         with open(f'items/item_{self.get_name()}.json', 'w') as f:
             f.write(json.dumps(to_json))
 
+    @classmethod
+    def _restore(cls, item_id, name, description, dispatch_time, cost, tags):
+        """Creates Item with known id without taking new id from generator. dispatch_time must be date"""
+        item = cls.__new__(cls)
+        item._tags = list(tags)
+        item._hub = None
+        item._stored_in = None
+        item._id = item_id
+        item._name = name
+        item._description = description
+        item._dispatch_time = dispatch_time
+        item._cost = cost
+        return item
+
     @staticmethod
     def create_from_json(file):
         """Creates Item from JSON file"""
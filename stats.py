@@ -0,0 +1,141 @@
+import collections
+import datetime
+import heapq
+
+
+class Rollup:
+    """Running count, sum, min and max of Items' costs"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self._costs = collections.Counter()  # Сколько раз встречается каждая цена
+        self._min_heap = []  # Кучи с ленивым удалением: цены, которых уже нет в _costs, выбрасываются при чтении
+        self._max_heap = []
+
+    def __len__(self):
+        return self.count
+
+    def add(self, cost):
+        """Adds one cost in rollup"""
+        if not self._costs[cost]:
+            heapq.heappush(self._min_heap, cost)
+            heapq.heappush(self._max_heap, -cost)
+            if len(self._min_heap) > 2 * len(self._costs) + 2 or len(self._max_heap) > 2 * len(self._costs) + 2:
+                self._rebuild_heaps(cost)
+        self._costs[cost] += 1
+        self.count += 1
+        self.total += cost
+
+    def remove(self, cost):
+        """Removes one cost from rollup"""
+        if not self._costs.get(cost):
+            raise ValueError(f'Cost {cost} is not in rollup')
+
+        self._costs[cost] -= 1
+        if not self._costs[cost]:
+            del self._costs[cost]
+        self.count -= 1
+        self.total -= cost
+
+    def _rebuild_heaps(self, cost):
+        """Drops stale costs from heaps. Cost is being added and isn't counted in _costs yet"""
+        self._min_heap = list(self._costs) + [cost]
+        self._max_heap = [-i for i in self._min_heap]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+    def min(self):
+        """Returns the lowest cost or None if rollup is empty"""
+        while self._min_heap and self._min_heap[0] not in self._costs:
+            heapq.heappop(self._min_heap)
+        return self._min_heap[0] if self._min_heap else None
+
+    def max(self):
+        """Returns the highest cost or None if rollup is empty"""
+        while self._max_heap and -self._max_heap[0] not in self._costs:
+            heapq.heappop(self._max_heap)
+        return -self._max_heap[0] if self._max_heap else None
+
+    def as_dict(self):
+        """Returns rollup as dict with count, sum, min and max keys"""
+        return {'count': self.count, 'sum': self.total, 'min': self.min(), 'max': self.max()}
+
+
+class Fenwick:
+    """Sparse Fenwick tree indexed by date ordinals. Keeps count and sum of costs"""
+    _size = datetime.date.max.toordinal()
+
+    def __init__(self):
+        self._counts = {}
+        self._sums = {}
+
+    def update(self, date, count, cost):
+        """Adds count and cost to the date"""
+        i = date.toordinal()
+        while i <= self._size:
+            self._counts[i] = self._counts.get(i, 0) + count
+            self._sums[i] = self._sums.get(i, 0) + cost
+            i += i & -i
+
+    def prefix(self, date):
+        """Returns count and sum of costs for all dates which are less or equal than argument"""
+        count, total = 0, 0
+        i = date.toordinal()
+        while i > 0:
+            count += self._counts.get(i, 0)
+            total += self._sums.get(i, 0)
+            i -= i & -i
+        return count, total
+
+    def range(self, min_date, max_date):
+        """Returns count and sum of costs for dates between arguments"""
+        count, total = self.prefix(max_date)
+        if min_date > datetime.date.min:
+            lower_count, lower_total = self.prefix(min_date - datetime.timedelta(days=1))
+            count, total = count - lower_count, total - lower_total
+        return count, total
+
+
+class SegmentTree:
+    """Sparse segment tree indexed by date ordinals. Keeps min and max of costs"""
+    _size = 1 << datetime.date.max.toordinal().bit_length()
+
+    def __init__(self):
+        self._nodes = {}  # Номер узла -> (min, max); пустых узлов в словаре нет
+
+    def update(self, date, low, high):
+        """Sets min and max of costs for the date. None means that there are no Items with this date"""
+        i = self._size + date.toordinal()
+        if low is None:
+            self._nodes.pop(i, None)
+        else:
+            self._nodes[i] = (low, high)
+
+        i //= 2
+        while i:
+            children = [self._nodes[c] for c in (2 * i, 2 * i + 1) if c in self._nodes]
+            if children:
+                self._nodes[i] = (min(c[0] for c in children), max(c[1] for c in children))
+            else:
+                self._nodes.pop(i, None)
+            i //= 2
+
+    def range(self, min_date, max_date):
+        """Returns min and max of costs for dates between arguments or (None, None)"""
+        nodes = []
+        left, right = self._size + min_date.toordinal(), self._size + max_date.toordinal() + 1
+        while left < right:
+            if left & 1:
+                nodes.append(left)
+                left += 1
+            if right & 1:
+                right -= 1
+                nodes.append(right)
+            left //= 2
+            right //= 2
+
+        values = [self._nodes[i] for i in nodes if i in self._nodes]
+        if not values:
+            return None, None
+        return min(v[0] for v in values), max(v[1] for v in values)
@@ -0,0 +1,407 @@
+import atexit
+import collections
+import datetime
+import itertools
+import sqlite3
+import uuid
+from item import Item
+
+
+class SQLiteStorage:
+    """Keeps Hub's Items in SQLite file. Set it as Hub.storage to use it instead of in-memory list.
+    Added Items are written at exit or when storage is closed, may be used as context manager"""
+    _chunk = 500  # Максимальное число параметров в одном запросе "IN (...)"
+
+    def __init__(self, path, cache_size=1024, batch_size=500):
+        self._connection = sqlite3.connect(path)
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._batch_size = batch_size
+        self._pending = {}  # Добавленные Items, которые еще не записаны в базу
+        self._position = None  # (индекс, seq) Item, последним прочитанного по позиции
+        self._hub = None
+
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY,
+                    seq INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    cost BLOB NOT NULL,  -- BLOB не меняет тип: int и float читаются такими же, как записаны
+                    dispatch_time TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS items_seq ON items (seq);
+                CREATE INDEX IF NOT EXISTS items_cost ON items (cost);
+                CREATE INDEX IF NOT EXISTS items_dispatch_time_cost ON items (dispatch_time, cost);
+                CREATE TABLE IF NOT EXISTS tags (
+                    item_id INTEGER NOT NULL,
+                    pos INTEGER NOT NULL,
+                    tag TEXT NOT NULL,
+                    cost BLOB NOT NULL,  -- Копия цены Item, чтобы min/max по тегу брались из индекса
+                    PRIMARY KEY (item_id, pos)
+                );
+                CREATE INDEX IF NOT EXISTS tags_tag_cost ON tags (tag, cost);
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS rollups (
+                    kind TEXT NOT NULL,  -- 'total', 'tag' или 'date'
+                    name TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    total BLOB NOT NULL,
+                    PRIMARY KEY (kind, name)
+                );
+            """)
+
+        with self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('uid', ?)", (uuid.uuid4().hex,))
+        self._uid = self._connection.execute("SELECT value FROM meta WHERE name = 'uid'").fetchone()[0]
+
+        max_id = self._connection.execute('SELECT MAX(id) FROM items').fetchone()[0]
+        if max_id is not None:
+            # Новые Items не должны получить id, которые уже есть в базе
+            Item._ids = itertools.count(max(max_id + 1, next(Item._ids)))
+
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.stats()['count']
+
+    def __iter__(self):
+        self.flush()
+        seq = 0
+        while True:
+            rows = self._connection.execute(
+                'SELECT id, seq FROM items WHERE seq > ? ORDER BY seq LIMIT ?', (seq, self._chunk)).fetchall()
+            if not rows:
+                return
+            yield from self._load([row[0] for row in rows])
+            seq = rows[-1][1]
+
+    def __contains__(self, item_id):
+        if item_id in self._pending:
+            return True
+        return self._connection.execute('SELECT 1 FROM items WHERE id = ?', (item_id,)).fetchone() is not None
+
+    def add(self, item):
+        """Adds Item in storage. Returns False if this Item is already stored.
+        If Item's id belongs to another stored Item (Item was created before file was opened) then Item gets new id"""
+        if item.get_id() in self:
+            if item._stored_in == self._uid or item._stored_in is not None and self._same_row(item):
+                return False  # Тот же Item или его копия из другого файла
+            item._id = next(Item._ids)
+
+        item._stored_in = self._uid
+
+        self._pending[item.get_id()] = item
+        self._cache_item(item)
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+        return True
+
+    def _same_row(self, item):
+        """Checks if stored row with Item's id has the same name, description and dispatch time"""
+        self.flush()
+        row = self._connection.execute('SELECT name, description, dispatch_time FROM items WHERE id = ?',
+                                       (item.get_id(),)).fetchone()
+        return row == (item.get_name(), item.get_descr(), item.get_date().isoformat())
+
+    def flush(self):
+        """Writes all added Items in database in one transaction"""
+        if not self._pending:
+            return
+
+        items = list(self._pending.values())
+        seq = itertools.count(self._connection.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM items').fetchone()[0])
+        deltas = {}
+        for item in items:
+            self._add_delta(deltas, 1, item.cost, self._keys(item.get_date().isoformat(), set(item.get_tags())))
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO items (id, seq, name, description, cost, dispatch_time) VALUES (?, ?, ?, ?, ?, ?)',
+                [(item.get_id(), next(seq), item.get_name(), item.get_descr(), item.cost,
+                  item.get_date().isoformat()) for item in items])
+            self._connection.executemany(
+                'INSERT INTO tags (item_id, pos, tag, cost) VALUES (?, ?, ?, ?)',
+                [(item.get_id(), pos, tag, item.cost) for item in items for pos, tag in enumerate(item.get_tags())])
+            self._roll(deltas)
+        self._pending = {}
+
+    def remove(self, item_ids):
+        """Removes Items from storage in one transaction"""
+        self.flush()
+        self._position = None
+        item_ids = list(dict.fromkeys(item_ids))
+
+        with self._connection:
+            for i in range(0, len(item_ids), self._chunk):
+                chunk = item_ids[i:i + self._chunk]
+                marks = ', '.join('?' * len(chunk))
+                tags = collections.defaultdict(list)
+                for item_id, tag in self._connection.execute(
+                        f'SELECT DISTINCT item_id, tag FROM tags WHERE item_id IN ({marks})', chunk):
+                    tags[item_id].append(tag)
+                deltas = {}
+                for item_id, cost, dispatch_time in self._connection.execute(
+                        f'SELECT id, cost, dispatch_time FROM items WHERE id IN ({marks})', chunk):
+                    self._add_delta(deltas, -1, -cost, self._keys(dispatch_time, tags[item_id]))
+
+                self._roll(deltas)
+                self._connection.execute(f'DELETE FROM items WHERE id IN ({marks})', chunk)
+                self._connection.execute(f'DELETE FROM tags WHERE item_id IN ({marks})', chunk)
+
+        for item_id in item_ids:
+            item = self._cache.pop(item_id, None)
+            if item is not None:
+                item._hub = None
+                item._stored_in = None
+
+    def update_cost(self, item):
+        """Writes Item's cost in database. Returns False if Item isn't stored"""
+        if item.get_id() in self._pending:
+            return True  # Текущее состояние Item будет записано при flush
+
+        row = self._connection.execute('SELECT cost, dispatch_time FROM items WHERE id = ?',
+                                       (item.get_id(),)).fetchone()
+        if row is None:
+            return False
+
+        tags = [tag for tag, in self._connection.execute('SELECT DISTINCT tag FROM tags WHERE item_id = ?',
+                                                         (item.get_id(),))]
+        deltas = {}
+        self._add_delta(deltas, 0, item.cost - row[0], self._keys(row[1], tags))
+        with self._connection:
+            self._connection.execute('UPDATE items SET cost = ? WHERE id = ?', (item.cost, item.get_id()))
+            self._connection.execute('UPDATE tags SET cost = ? WHERE item_id = ?', (item.cost, item.get_id()))
+            self._roll(deltas)
+        self._cache_item(item)
+        return True
+
+    def update_tags(self, item, added, removed):
+        """Writes added and removed Item's tags in database. Returns False if Item isn't stored"""
+        if item.get_id() in self._pending:
+            return True
+        row = self._connection.execute('SELECT cost FROM items WHERE id = ?', (item.get_id(),)).fetchone()
+        if row is None:
+            return False
+
+        deltas = {}
+        self._add_delta(deltas, 1, row[0], [('tag', tag) for tag in added])
+        self._add_delta(deltas, -1, -row[0], [('tag', tag) for tag in removed])
+        with self._connection:
+            self._connection.executemany('DELETE FROM tags WHERE item_id = ? AND tag = ?',
+                                         [(item.get_id(), tag) for tag in removed])
+            pos = self._connection.execute('SELECT COALESCE(MAX(pos), -1) + 1 FROM tags WHERE item_id = ?',
+                                           (item.get_id(),)).fetchone()[0]
+            self._connection.executemany('INSERT INTO tags (item_id, pos, tag, cost) VALUES (?, ?, ?, ?)',
+                                         [(item.get_id(), pos + i, tag, row[0]) for i, tag in enumerate(added)])
+            self._roll(deltas)
+        self._cache_item(item)
+        return True
+
+    def stats(self, min_date=None, max_date=None, tag=None):
+        """Returns count, sum, min and max of costs of all Items, Items with tag or Items between dates.
+        Count and sum are read from rollups, min and max - from indexes on cost.
+        For dates range rollups of every date in range are summed and min/max look through index entries of range"""
+        self.flush()
+        if tag is not None:
+            totals = "SELECT SUM(count), SUM(total) FROM rollups WHERE kind = 'tag' AND name = ?", [tag]
+            extremes = """SELECT (SELECT MIN(cost) FROM tags WHERE tag = ?),
+                                 (SELECT MAX(cost) FROM tags WHERE tag = ?)""", [tag, tag]
+        elif min_date is not None:
+            dates = [min_date.isoformat(), max_date.isoformat()]
+            totals = "SELECT SUM(count), SUM(total) FROM rollups WHERE kind = 'date' AND name BETWEEN ? AND ?", dates
+            extremes = """SELECT (SELECT MIN(cost) FROM items WHERE dispatch_time BETWEEN ? AND ?),
+                                 (SELECT MAX(cost) FROM items WHERE dispatch_time BETWEEN ? AND ?)""", dates * 2
+        else:
+            totals = "SELECT SUM(count), SUM(total) FROM rollups WHERE kind = 'total'", []
+            extremes = 'SELECT (SELECT MIN(cost) FROM items), (SELECT MAX(cost) FROM items)', []
+
+        count, total = self._connection.execute(*totals).fetchone()
+        return self._as_stats((count or 0, total or 0) + self._connection.execute(*extremes).fetchone())
+
+    def tag_stats(self):
+        """Returns dict where keys are tags and values are statistics of Items with this tag"""
+        self.flush()
+        return {row[0]: self._as_stats(row[1:]) for row in self._connection.execute("""
+            SELECT name, count, total,
+                   (SELECT MIN(cost) FROM tags WHERE tag = name), (SELECT MAX(cost) FROM tags WHERE tag = name)
+            FROM rollups WHERE kind = 'tag'""")}
+
+    def date_stats(self):
+        """Returns dict where keys are dispatch dates and values are statistics of Items with this date"""
+        self.flush()
+        return {datetime.date.fromisoformat(row[0]): self._as_stats(row[1:]) for row in self._connection.execute("""
+            SELECT name, count, total,
+                   (SELECT MIN(cost) FROM items WHERE dispatch_time = name),
+                   (SELECT MAX(cost) FROM items WHERE dispatch_time = name)
+            FROM rollups WHERE kind = 'date' ORDER BY name""")}
+
+    @staticmethod
+    def _as_stats(row):
+        """Returns aggregate row as dict with count, sum, min and max keys"""
+        return dict(zip(('count', 'sum', 'min', 'max'), row))
+
+    @staticmethod
+    def _keys(dispatch_time, tags):
+        """Returns rollups keys of Item: total, its dispatch date and its tags"""
+        return [('total', ''), ('date', dispatch_time)] + [('tag', tag) for tag in tags]
+
+    @staticmethod
+    def _add_delta(deltas, count, cost, keys):
+        """Adds change of count and cost for rollups keys in deltas"""
+        for key in keys:
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += count
+            delta[1] += cost
+
+    def _roll(self, deltas):
+        """Writes deltas in rollups and drops rollups without Items. Must be called inside transaction"""
+        rows = [(kind, name, count, total) for (kind, name), (count, total) in deltas.items() if count or total]
+        self._connection.executemany("""
+            INSERT INTO rollups (kind, name, count, total) VALUES (?, ?, ?, ?)
+            ON CONFLICT (kind, name) DO UPDATE SET count = count + excluded.count, total = total + excluded.total""",
+                                     rows)
+        self._connection.executemany('DELETE FROM rollups WHERE kind = ? AND name = ? AND count = 0',
+                                     [row[:2] for row in rows])
+
+    def clear(self):
+        """Removes all Items from storage"""
+        self._pending = {}
+        self._position = None
+        self._cache.clear()
+        with self._connection:
+            self._connection.execute('DELETE FROM items')
+            self._connection.execute('DELETE FROM tags')
+            self._connection.execute('DELETE FROM rollups')
+
+    def close(self):
+        """Writes added Items and closes database"""
+        atexit.unregister(self.close)
+        self.flush()
+        self._connection.close()
+
+    def get(self, item_id):
+        """Returns Item by id or None"""
+        self.flush()
+        items = self._load([item_id])
+        return items[0] if items else None
+
+    def at(self, index):
+        """Returns Item by its position in storage.
+        Search starts from the last read position, so reading neighbouring positions one by one is cheap,
+        but a jump costs as many index entries as its length"""
+        self.flush()
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError('Hub index out of range')
+
+        last, seq = self._position if self._position is not None else (-1, 0)
+        if index == last:
+            query, params = 'SELECT id, seq FROM items WHERE seq = ?', (seq,)
+        elif index > last:
+            query, params = 'SELECT id, seq FROM items WHERE seq > ? ORDER BY seq LIMIT 1 OFFSET ?', (seq, index - last - 1)
+        else:
+            query, params = ('SELECT id, seq FROM items WHERE seq < ? ORDER BY seq DESC LIMIT 1 OFFSET ?',
+                             (seq, last - index - 1))
+        row = self._connection.execute(query, params).fetchone()
+        if row is None:
+            raise IndexError('Hub index out of range')
+
+        self._position = (index, row[1])
+        return self._load([row[0]])[0]
+
+    def index(self, item_id):
+        """Returns position of Item in storage or -1"""
+        self.flush()
+        row = self._connection.execute(
+            'SELECT (SELECT COUNT(*) FROM items AS i WHERE i.seq < items.seq) FROM items WHERE id = ?',
+            (item_id,)).fetchone()
+        return -1 if row is None else row[0]
+
+    def find_by_tags(self, tags):
+        """Returns list of Items which tags are contained in argument.
+        If argument is string then tags must be its substrings, the same as "in" works for Hub's list"""
+        if isinstance(tags, str):
+            mismatch, params = 'instr(?, tag) = 0', [tags]
+        else:
+            params = list(tags)
+            mismatch = f'tag NOT IN ({", ".join("?" * len(params))})'
+        return self._select(f"""
+            SELECT id FROM items
+            WHERE id NOT IN (SELECT item_id FROM tags WHERE {mismatch})
+              AND (SELECT COUNT(*) FROM tags WHERE item_id = id) <= ?
+            ORDER BY seq""", params + [len(tags)])
+
+    def find_by_date(self, min_date, max_date):
+        """Returns list of Items where dispatch time is between arguments"""
+        return self._select('SELECT id FROM items WHERE dispatch_time BETWEEN ? AND ? ORDER BY seq',
+                            [min_date.isoformat(), max_date.isoformat()])
+
+    def find_most_valuable(self, amount):
+        """Returns Items with one of the highest costs sorted by cost"""
+        return self._select("""
+            SELECT id FROM items
+            WHERE cost IN (SELECT DISTINCT cost FROM items ORDER BY cost DESC LIMIT ?)
+            ORDER BY cost, seq""", [amount])
+
+    def _select(self, query, params):
+        """Returns list of Items which ids are returned by query"""
+        self.flush()
+        ids = [row[0] for row in self._connection.execute(query, params)]
+        items = []
+        for i in range(0, len(ids), self._chunk):
+            items.extend(self._load(ids[i:i + self._chunk]))
+        return items
+
+    def _load(self, item_ids):
+        """Returns Items by ids from cache or database keeping order of ids"""
+        found = {}
+        for item_id in item_ids:
+            if item_id in self._cache:
+                self._cache.move_to_end(item_id)
+                found[item_id] = self._cache[item_id]
+
+        for item in self._fetch([item_id for item_id in item_ids if item_id not in found]):
+            self._cache_item(item)
+            found[item.get_id()] = item
+
+        return [found[item_id] for item_id in item_ids if item_id in found]
+
+    def _fetch(self, item_ids):
+        """Reads Items by ids from database bypassing cache"""
+        if not item_ids:
+            return []
+
+        marks = ', '.join('?' * len(item_ids))
+        tags = collections.defaultdict(list)
+        for item_id, tag in self._connection.execute(
+                f'SELECT item_id, tag FROM tags WHERE item_id IN ({marks}) ORDER BY item_id, pos', item_ids):
+            tags[item_id].append(tag)
+
+        items = []
+        for item_id, name, description, cost, dispatch_time in self._connection.execute(
+                f'SELECT id, name, description, cost, dispatch_time FROM items WHERE id IN ({marks})', item_ids):
+            item = Item._restore(item_id, name, description, datetime.date.fromisoformat(dispatch_time), cost,
+                                 tags[item_id])
+            item._hub = self._hub
+            item._stored_in = self._uid
+            items.append(item)
+        return items
+
+    def _cache_item(self, item):
+        """Puts Item in cache and drops the least recently used Items if cache is full"""
+        self._cache[item.get_id()] = item
+        self._cache.move_to_end(item.get_id())
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
@@ -1,8 +1,16 @@
 import datetime
+import itertools
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
 import unittest
 import random
 from item import Item
 from hub import Hub
+from storage import SQLiteStorage
+from stats import Rollup
 
 
 def create_item():
@@ -126,6 +134,74 @@ class TestHub(unittest.TestCase):
 
         self.assertEqual(len(h.find_most_valuable()), 5)
 
+    def test_stats(self):
+        h = Hub()
+        h.clear()
+
+        self.assertEqual(h.stats(), {'count': 0, 'sum': 0, 'min': None, 'max': None})
+
+        for i in range(5):
+            h.add_item(Item(f'name_{i + 1}', f'description_{i + 1}', f'1{i}.11.2023', (i + 1) * 1000,
+                            'tag1', f'tag{i % 2 + 2}'))
+
+        self.assertEqual(h.stats(), {'count': 5, 'sum': 15000, 'min': 1000, 'max': 5000})
+        self.assertEqual(h.stats(tag='tag1'), {'count': 5, 'sum': 15000, 'min': 1000, 'max': 5000})
+        self.assertEqual(h.stats(tag='tag2'), {'count': 3, 'sum': 9000, 'min': 1000, 'max': 5000})
+        self.assertEqual(h.stats(tag='tag3'), {'count': 2, 'sum': 6000, 'min': 2000, 'max': 4000})
+        self.assertEqual(h.stats(tag='tag4')['count'], 0)
+        self.assertEqual(len(h.tag_stats()), 3)
+
+    def test_stats_by_date(self):
+        h = Hub()
+        h.clear()
+
+        for i in range(5):
+            h.add_item(Item(f'name_{i + 1}', f'description_{i + 1}', f'1{i}.11.2023', (i + 1) * 1000, 'tag1'))
+
+        self.assertEqual(h.stats('11.11.2023', '13.11.2023'), {'count': 3, 'sum': 9000, 'min': 2000, 'max': 4000})
+        self.assertEqual(h.stats('13.11.2023', '11.11.2023'), h.stats('11.11.2023', '13.11.2023'))
+        self.assertEqual(h.stats('12.11.2023'), {'count': 3, 'sum': 6000, 'min': 1000, 'max': 3000})
+        self.assertEqual(h.stats('01.11.2023')['count'], 0)
+        self.assertEqual(h.date_stats()[datetime.date(2023, 11, 14)]['sum'], 5000)
+        with self.assertRaises(AttributeError):
+            h.stats('10.11.23')
+        with self.assertRaises(AttributeError):
+            h.stats('10.11.2023', tag='tag1')
+
+    def test_stats_updates(self):
+        h = Hub()
+        h.clear()
+
+        items = []
+        for i in range(5):
+            item = Item(f'name_{i + 1}', f'description_{i + 1}', f'1{i}.11.2023', (i + 1) * 1000, 'tag1')
+            h.add_item(item)
+            items.append(item)
+
+        items[4].cost = 500
+        self.assertEqual(h.stats(), {'count': 5, 'sum': 10500, 'min': 500, 'max': 4000})
+        self.assertEqual(h.stats('14.11.2023', '14.11.2023')['sum'], 500)
+
+        items[0].add_tags(['tag2', 'tag3'])
+        items[1].add_tag('tag2')
+        self.assertEqual(h.stats(tag='tag2'), {'count': 2, 'sum': 3000, 'min': 1000, 'max': 2000})
+        items[0].rm_tags(['tag2', 'tag3'])
+        self.assertEqual(h.stats(tag='tag2')['count'], 1)
+        self.assertNotIn('tag3', h.tag_stats())
+
+        h.rm_item(items[3])
+        h.drop_items(items[:1])
+        self.assertEqual(h.stats(), {'count': 3, 'sum': 5500, 'min': 500, 'max': 3000})
+        self.assertEqual(h.stats('13.11.2023')['count'], 2)
+        self.assertEqual(h.stats('10.11.2023', '13.11.2023'), {'count': 2, 'sum': 5000, 'min': 2000, 'max': 3000})
+
+        items[3].cost = 100
+        self.assertEqual(h.stats()['min'], 500)
+
+        h.clear()
+        self.assertEqual(h.stats()['count'], 0)
+        self.assertEqual(h.date_stats(), {})
+
 
 class TestItem(unittest.TestCase):
     def test_item_id(self):
@@ -225,5 +301,218 @@ class TestItem(unittest.TestCase):
         self.assertEqual(item.cost, 10000)
 
 
+class TestRollup(unittest.TestCase):
+    def test_min_max_after_removing(self):
+        rollup = Rollup()
+        for cost in (300, 100, 200, 100):
+            rollup.add(cost)
+
+        rollup.remove(100)
+        self.assertEqual(rollup.as_dict(), {'count': 3, 'sum': 600, 'min': 100, 'max': 300})
+        rollup.remove(100)
+        rollup.remove(300)
+        self.assertEqual(rollup.as_dict(), {'count': 1, 'sum': 200, 'min': 200, 'max': 200})
+
+        with self.assertRaises(ValueError):
+            rollup.remove(500)
+        self.assertEqual(rollup.as_dict(), {'count': 1, 'sum': 200, 'min': 200, 'max': 200})
+
+
+    def test_heaps_size(self):
+        rollup = Rollup()
+        rollup.add(1)
+        for _ in range(10000):
+            rollup.add(5)
+            rollup.remove(5)
+
+        self.assertLessEqual(len(rollup._min_heap), 4)
+        self.assertLessEqual(len(rollup._max_heap), 4)
+        self.assertEqual(rollup.as_dict(), {'count': 1, 'sum': 1, 'min': 1, 'max': 1})
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'hub.db')
+        self.hub = Hub()
+        self.hub.clear()
+        self.hub.storage = SQLiteStorage(self.path, cache_size=2, batch_size=3)
+
+    def tearDown(self):
+        self.hub.clear()
+        self.hub.storage = None
+        self.tmp.cleanup()
+
+    def fill(self):
+        items = []
+        for i in range(5):
+            item = Item(f'name_{i + 1}', f'description_{i + 1}', f'1{i}.11.2023', (i + 1) * 1000, 'tag1')
+            self.hub.add_item(item)
+            items.append(item)
+        return items
+
+    def test_hub_api(self):
+        h = self.hub
+        items = self.fill()
+        h.add_item(items[0])
+
+        self.assertEqual(len(h), 5)
+        self.assertEqual([item.get_id() for item in h], [item.get_id() for item in items])
+        self.assertEqual(h[-1].get_name(), 'name_5')
+        self.assertEqual(h.find_by_id(items[2].get_id()), [2, 'name_3'])
+        self.assertEqual(h.find_by_id(-5), [-1, None])
+        self.assertEqual(len(h.find_by_tags(['tag1'])), 5)
+        self.assertEqual(len(h.find_by_date('10.11.2023', '12.11.2023')), 3)
+        self.assertEqual(len(h.find_by_date('13.11.2023')), 4)
+        self.assertEqual(h.find_most_valuable()[0].cost, 5000)
+        self.assertEqual(len(h.find_most_valuable(2)), 2)
+        with self.assertRaises(IndexError):
+            h[5]
+
+        h.rm_item(items[4].get_id())
+        h.drop_items(items[:2])
+        self.assertEqual([item.get_name() for item in h], ['name_3', 'name_4'])
+        self.assertEqual(h.stats(), {'count': 2, 'sum': 7000, 'min': 3000, 'max': 4000})
+
+    def test_positions(self):
+        h = self.hub
+        items = self.fill()
+
+        self.assertEqual([h[i].get_id() for i in range(len(h))], [item.get_id() for item in items])
+        self.assertEqual([h[-i].get_id() for i in range(1, len(h) + 1)], [item.get_id() for item in items[::-1]])
+        h.rm_item(items[1])
+        self.assertEqual(h[1].get_id(), items[2].get_id())
+        self.assertEqual(h[3].get_id(), items[4].get_id())
+        with self.assertRaises(IndexError):
+            h[-5]
+
+    def test_find_by_tags_string(self):
+        h = self.hub
+        h.add_item(Item('name_1', 'description', '10.11.2023', 100, 'tag1'))
+        h.add_item(Item('name_2', 'description', '10.11.2023', 100, 'tag1', 'tag2'))
+        h.add_item(Item('name_3', 'description', '10.11.2023', 100, 'ag'))
+        h.add_item(Item('name_4', 'description', '10.11.2023', 100, ''))
+        h.add_item(Item('name_5', 'description', '10.11.2023', 100, 'tag2'))
+
+        self.assertEqual([item.get_name() for item in h.find_by_tags('tag1')], ['name_1', 'name_3', 'name_4'])
+        self.assertEqual([item.get_name() for item in h.find_by_tags(['tag1'])], ['name_1'])
+
+    def test_updates(self):
+        h = self.hub
+        items = self.fill()
+
+        items[0].cost = 6000
+        items[1].add_tags(['tag2', 'tag3'])
+        items[1].rm_tag('tag1')
+        self.assertEqual(h.find_most_valuable()[0].get_id(), items[0].get_id())
+        self.assertEqual(h.find_by_tags(['tag2', 'tag3'])[0].get_id(), items[1].get_id())
+        self.assertEqual(h.stats(tag='tag1'), {'count': 4, 'sum': 18000, 'min': 3000, 'max': 6000})
+
+        h.rm_item(items[0])
+        items[0].cost = 100
+        self.assertEqual(h.stats()['count'], 4)
+
+    def test_pending_updates(self):
+        h = self.hub
+        items = self.fill()
+
+        items[4].cost = 6000
+        items[4].add_tag('tag2')
+        items[3].rm_tag('tag1')
+        self.assertEqual(h.stats(), {'count': 5, 'sum': 16000, 'min': 1000, 'max': 6000})
+        self.assertEqual(h.stats(tag='tag1'), {'count': 4, 'sum': 12000, 'min': 1000, 'max': 6000})
+        self.assertEqual(h.stats(tag='tag2'), {'count': 1, 'sum': 6000, 'min': 6000, 'max': 6000})
+        self.assertEqual(h.stats('13.11.2023', '14.11.2023'), {'count': 2, 'sum': 10000, 'min': 4000, 'max': 6000})
+        self.assertEqual(h.date_stats()[datetime.date(2023, 11, 14)]['sum'], 6000)
+        self.assertEqual(h.tag_stats()['tag2']['count'], 1)
+
+        h.storage = SQLiteStorage(self.path)
+        self.assertEqual(h.find_by_id(items[4].get_id()), [4, 'name_5'])
+        self.assertEqual(h[4].cost, 6000)
+        self.assertEqual(h[4].get_tags(), ['tag1', 'tag2'])
+        self.assertEqual(h[3].get_tags(), [])
+
+    def test_open_existing_file(self):
+        h = self.hub
+        path = os.path.join(self.tmp.name, 'existing.db')
+        stored = [Item(f'name_{i + 1}', 'description', '10.11.2023', 100, 'tag1') for i in range(3)]
+        storage = SQLiteStorage(path)
+        for item in stored:
+            storage.add(item)
+        storage.close()
+
+        Item._ids = itertools.count(stored[0].get_id())  # Как в новом процессе: id начинаются заново
+        item = Item('name', 'description', '10.11.2023', 100, 'x')
+        memory_item = Item('name', 'description', '10.11.2023', 100, 'y')
+        self.assertEqual(item.get_id(), stored[0].get_id())
+
+        h.storage = None
+        h.add_item(memory_item)
+        h.storage = SQLiteStorage(path)
+        h.add_item(item)
+
+        self.assertEqual(len(h), 5)
+        self.assertEqual(h.find_by_tags(['x']), [item])
+        self.assertEqual(h.find_by_tags(['y']), [memory_item])
+        self.assertEqual(len({i.get_id() for i in h}), 5)
+        self.assertEqual(h.find_by_id(stored[0].get_id())[1], 'name_1')
+
+    def test_flush(self):
+        h = self.hub
+        self.fill()
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM items').fetchone()[0], 3)
+            h.flush()
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM items').fetchone()[0], 5)
+
+    def test_flush_at_exit(self):
+        path = os.path.join(self.tmp.name, 'exit.db')
+        subprocess.run([sys.executable, '-c', f'''
+from hub import Hub
+from item import Item
+from storage import SQLiteStorage
+h = Hub()
+h.storage = SQLiteStorage({path!r})
+for i in range(3):
+    h.add_item(Item(f'name_{{i}}', 'description', '10.11.2023', 100, 'tag1'))
+'''], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+        with SQLiteStorage(path) as storage:
+            self.assertEqual(len(storage), 3)
+
+    def test_cost_type(self):
+        h = self.hub
+        items = self.fill()
+        items[0].cost = 1000.5
+        items[1].cost = 2000.0
+
+        h.storage = SQLiteStorage(self.path)
+        self.assertEqual([type(item.cost) for item in h], [float, float, int, int, int])
+        self.assertEqual(h[1].cost, 2000.0)
+
+    def test_reopen(self):
+        h = self.hub
+        items = self.fill()
+        items[2].add_tag('tag2')
+
+        h.storage = SQLiteStorage(self.path)
+        self.assertEqual(len(h), 5)
+        self.assertEqual(h.find_by_tags(['tag1', 'tag2'])[2].get_tags(), ['tag1', 'tag2'])
+        self.assertEqual(h.stats(tag='tag2'), {'count': 1, 'sum': 3000, 'min': 3000, 'max': 3000})
+        self.assertEqual(h.find_by_id(items[4].get_id()), [4, 'name_5'])
+
+        h.storage = SQLiteStorage(os.path.join(self.tmp.name, 'copy.db'))
+        self.assertEqual([item.get_id() for item in h], [item.get_id() for item in items])
+        previous = SQLiteStorage(self.path)
+        self.assertEqual(len(previous), 5)
+        previous.close()
+
+        next_id = Item('name', 'description', '06.12.2023', 100).get_id()
+        self.assertNotIn(next_id, [i.get_id() for i in items])
+
+        h.storage = SQLiteStorage(self.path)
+        self.assertEqual(len(h.get_items()), 5)
+        self.assertEqual(Item('name', 'description', '06.12.2023', 100).get_id(), next_id + 1)
+
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)